@@ -2,7 +2,7 @@ import logging
 from datetime import datetime, timezone
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import select
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
 
 from ..core.config import ADMIN_SECRET
@@ -15,12 +15,14 @@ from ..core.schemas import (
     AdminImportSubscribersIn,
     AdminLoginIn,
     AdminSendIn,
+    AdminStatsOut,
     NotificationOut,
     SubscriberOut,
 )
-from ..utils.notifications import generate_vapid_keys, get_cached_vapid_keys
+from ..utils.notifications import build_notification_data, generate_vapid_keys, get_cached_vapid_keys
 from ..utils.notifications import import_vapid_keys as service_import_vapid_keys
 from ..utils.notifications import send_push_notification
+from ..utils.stats import get_dashboard_stats, record_delivery, record_subscribers_added
 
 logger = logging.getLogger(__name__)
 
@@ -68,13 +70,12 @@ def admin_upload_keys(payload: AdminImportKeysIn, db: Session = Depends(get_db))
     return {"publicKey": keys["public_key"], "privateKey": keys["private_key"]}
 
 
-@router.post("/stats")
-def admin_stats(payload: AdminLoginIn, db: Session = Depends(get_db)) -> dict[str, int]:
+@router.post("/stats", response_model=AdminStatsOut)
+def admin_stats(payload: AdminLoginIn, db: Session = Depends(get_db)):
     if payload.secret != ADMIN_SECRET:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid secret")
 
-    count = db.execute(select(Subscription)).scalars().all()
-    return {"devices": len(count)}
+    return get_dashboard_stats(db)
 
 
 @router.post("/send")
@@ -109,11 +110,12 @@ def admin_send(payload: AdminSendIn, db: Session = Depends(get_db)) -> dict[str,
         "url": f"/notification?id={notification.id}",
     }
 
-    result = send_push_notification(notification_data, db)
+    result = send_push_notification(notification_data, db, notification.id)
 
     notification.successful_count = result["sent"]
     notification.failed_count = result["failed"]
     notification.status = "sent" if result["sent"] > 0 else "failed"
+    record_delivery(db, notification, result["sent"], result["failed"])
     db.commit()
 
     return result
@@ -155,7 +157,7 @@ def admin_history(payload: AdminHistoryIn, db: Session = Depends(get_db)):
     if payload.status and payload.status != "all":
         query = query.where(Notification.status == payload.status)
 
-    total_count = len(db.execute(query).scalars().all())
+    total_count = db.execute(select(func.count()).select_from(query.subquery())).scalar_one()
 
     notifications = (
         db.execute(query.order_by(Notification.id.desc()).offset(payload.offset).limit(payload.limit)).scalars().all()
@@ -184,15 +186,17 @@ def admin_import_subscribers(payload: AdminImportSubscribersIn, db: Session = De
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid secret")
 
     logger.info(f"Admin importing subscribers. Count: {len(payload.subscribers)}")
-    count = 0
+    added = []
     for sub_data in payload.subscribers:
         exists = db.execute(select(Subscription).where(Subscription.endpoint == sub_data.endpoint)).scalar_one_or_none()
 
         if not exists:
             new_sub = Subscription(endpoint=sub_data.endpoint, p256dh=sub_data.p256dh, auth=sub_data.auth)
             db.add(new_sub)
-            count += 1
+            added.append(sub_data.endpoint)
 
+    count = len(added)
+    record_subscribers_added(db, added)
     db.commit()
     logger.info(f"Imported {count} new subscribers")
     return {"message": f"Imported {count} new subscribers"}
@@ -206,18 +210,12 @@ def send_notification_job(notification_id: int):
             return
 
         logger.info(f"Job: Sending scheduled notification {notification_id}")
-        notification_data = {
-            "title": notification.title,
-            "body": notification.body,
-            "image": notification.image_url,
-            "url": f"/notification?id={notification.id}",
-        }
-
-        result = send_push_notification(notification_data, db)
+        result = send_push_notification(build_notification_data(notification), db, notification.id)
 
         notification.status = "sent" if result["sent"] > 0 else "failed"
         notification.successful_count = result["sent"]
         notification.failed_count = result["failed"]
+        record_delivery(db, notification, result["sent"], result["failed"])
         db.commit()
     except Exception:
         logger.exception(f"Error sending scheduled notification {notification_id}")
@@ -6,6 +6,7 @@ from ..core.database import get_db
 from ..core.models import Notification, Subscription
 from ..core.schemas import NotificationOut, SubscriptionIn
 from ..utils.notifications import get_cached_vapid_keys
+from ..utils.stats import record_subscribers_added, record_view
 
 router = APIRouter(tags=["public"])
 
@@ -38,6 +39,7 @@ def track_notification_view(id: int, db: Session = Depends(get_db)):
     notif = db.get(Notification, id)
     if notif:
         notif.views += 1
+        record_view(db, notif)
         db.commit()
     return {"status": "ok"}
 
@@ -56,5 +58,6 @@ def subscribe(payload: SubscriptionIn, db: Session = Depends(get_db)) -> dict[st
                 auth=payload.keys.auth,
             )
         )
+        record_subscribers_added(db, [payload.endpoint])
     db.commit()
     return {"status": "saved"}
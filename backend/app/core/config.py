@@ -11,5 +11,13 @@ ADMIN_SECRET = os.getenv("ADMIN_SECRET", "change-me")
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./app.db")
 VAPID_SUBJECT = os.getenv("VAPID_SUBJECT", "mailto:admin@example.com")
 VAPID_TTL = int(os.getenv("VAPID_TTL", 259200))
+PUSH_TIMEOUT = float(os.getenv("PUSH_TIMEOUT", 10))
+RETRY_MAX_ATTEMPTS = int(os.getenv("RETRY_MAX_ATTEMPTS", 5))
+RETRY_BASE_DELAY = int(os.getenv("RETRY_BASE_DELAY", 60))
+RETRY_MAX_DELAY = int(os.getenv("RETRY_MAX_DELAY", 3600))
+RETRY_BATCH_SIZE = int(os.getenv("RETRY_BATCH_SIZE", 100))
+RETRY_INTERVAL = int(os.getenv("RETRY_INTERVAL", 60))
+STATS_RECONCILE_HOURS = int(os.getenv("STATS_RECONCILE_HOURS", 24))
+STATS_DAYS = int(os.getenv("STATS_DAYS", 30))
 ALLOWED_ORIGINS = os.getenv("ALLOWED_ORIGINS", "*").split(",")
 VERSION = "1.0.0"
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, DateTime, Integer, String, Text, func
+from sqlalchemy import Column, Date, DateTime, Integer, String, Text, func
 
 from .database import Base
 
@@ -35,3 +35,40 @@ class Notification(Base):
     successful_count = Column(Integer, default=0, nullable=False)
     failed_count = Column(Integer, default=0, nullable=False)
     views = Column(Integer, default=0, nullable=False)
+
+
+class DeliveryRetry(Base):
+    __tablename__ = "delivery_retries"
+
+    id = Column(Integer, primary_key=True, index=True)
+    notification_id = Column(Integer, index=True, nullable=False)
+    subscription_id = Column(Integer, index=True, nullable=False)
+    attempts = Column(Integer, default=1, nullable=False)
+    next_attempt_at = Column(DateTime(timezone=True), index=True, nullable=False)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
+class StatCounter(Base):
+    __tablename__ = "stat_counters"
+
+    name = Column(String, primary_key=True)
+    value = Column(Integer, default=0, nullable=False)
+
+
+class OriginStat(Base):
+    __tablename__ = "origin_stats"
+
+    origin = Column(String, primary_key=True)
+    subscribers = Column(Integer, default=0, nullable=False)
+
+
+class DailyStat(Base):
+    __tablename__ = "daily_stats"
+
+    day = Column(Date, primary_key=True)
+    new_subscribers = Column(Integer, default=0, nullable=False)
+    pruned_subscribers = Column(Integer, default=0, nullable=False)
+    sent = Column(Integer, default=0, nullable=False)
+    failed = Column(Integer, default=0, nullable=False)
+    views = Column(Integer, default=0, nullable=False)
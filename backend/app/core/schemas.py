@@ -1,4 +1,4 @@
-from datetime import datetime
+from datetime import date, datetime
 
 from pydantic import BaseModel, Field, HttpUrl, field_serializer, field_validator
 
@@ -84,3 +84,21 @@ class SubscriberOut(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class DailyStatOut(BaseModel):
+    day: date
+    new_subscribers: int
+    pruned_subscribers: int
+    sent: int
+    failed: int
+    views: int
+
+    class Config:
+        from_attributes = True
+
+
+class AdminStatsOut(BaseModel):
+    devices: int
+    origins: dict[str, int]
+    daily: list[DailyStatOut]
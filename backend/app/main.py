@@ -8,11 +8,12 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from .api import admin, public
-from .core.config import ALLOWED_ORIGINS
+from .core.config import ALLOWED_ORIGINS, RETRY_INTERVAL, STATS_RECONCILE_HOURS
 from .core.database import Base, SessionLocal, engine
 from .core.scheduler import scheduler
 from .utils.logger import setup_logging
-from .utils.notifications import perform_resilience_check
+from .utils.notifications import perform_resilience_check, process_retry_queue
+from .utils.stats import ensure_stats, reconcile_stats_job
 
 setup_logging()
 
@@ -25,9 +26,16 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     Base.metadata.create_all(bind=engine)
     db = SessionLocal()
     try:
+        ensure_stats(db)
         perform_resilience_check(db, scheduler)
     finally:
         db.close()
+    scheduler.add_job(
+        reconcile_stats_job, "interval", hours=STATS_RECONCILE_HOURS, id="reconcile_stats", replace_existing=True
+    )
+    scheduler.add_job(
+        process_retry_queue, "interval", seconds=RETRY_INTERVAL, id="delivery_retries", replace_existing=True
+    )
     scheduler.start()
     yield
     scheduler.shutdown()
@@ -1,23 +1,37 @@
 import base64
 import json
 import logging
-from datetime import datetime, timezone
+import random
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
 from typing import Any, Dict
 
+import requests
 from apscheduler.schedulers.background import BackgroundScheduler
 from cryptography.hazmat.primitives import serialization
 from py_vapid import Vapid, Vapid01
 from pywebpush import WebPushException, webpush
-from sqlalchemy import select
+from sqlalchemy import delete, select
 from sqlalchemy.orm import Session
 
-from ..core.config import VAPID_SUBJECT, VAPID_TTL
+from ..core.config import (
+    PUSH_TIMEOUT,
+    RETRY_BASE_DELAY,
+    RETRY_BATCH_SIZE,
+    RETRY_MAX_ATTEMPTS,
+    RETRY_MAX_DELAY,
+    VAPID_SUBJECT,
+    VAPID_TTL,
+)
 from ..core.database import SessionLocal
-from ..core.models import Notification, Subscription, VapidKeys
+from ..core.models import DeliveryRetry, Notification, Subscription, VapidKeys
+from .stats import record_delivery, record_subscribers_pruned, reset_subscriber_stats
 
 logger = logging.getLogger(__name__)
 
 _vapid_keys_cache = None
+_http_session = requests.Session()
 
 
 def get_cached_vapid_keys() -> Dict[str, str] | None:
@@ -45,6 +59,8 @@ def get_vapid_keys() -> Dict[str, str] | None:
 def generate_vapid_keys(db: Session) -> Dict[str, str]:
     db.query(VapidKeys).delete()
     db.query(Subscription).delete()
+    db.query(DeliveryRetry).delete()
+    reset_subscriber_stats(db)
 
     vapid = Vapid01()
     vapid.generate_keys()
@@ -80,6 +96,8 @@ def generate_vapid_keys(db: Session) -> Dict[str, str]:
 def import_vapid_keys(db: Session, public_key: str, private_key: str) -> Dict[str, str]:
     db.query(VapidKeys).delete()
     db.query(Subscription).delete()
+    db.query(DeliveryRetry).delete()
+    reset_subscriber_stats(db)
 
     vapid_keys = VapidKeys(public_key=public_key, private_key=private_key, subject=VAPID_SUBJECT)
 
@@ -98,43 +116,221 @@ def import_vapid_keys(db: Session, public_key: str, private_key: str) -> Dict[st
     return _vapid_keys_cache
 
 
-def send_push_notification(notification_data: Dict[str, Any], db: Session) -> Dict[str, int]:
+def build_notification_data(notification: Notification) -> Dict[str, Any]:
+    return {
+        "title": notification.title,
+        "body": notification.body,
+        "image": notification.image_url,
+        "url": f"/notification?id={notification.id}",
+    }
+
+
+def _push(sub: Subscription, message_data: str, vapid_obj: Vapid, keys: Dict[str, str]) -> None:
+    webpush(
+        subscription_info={
+            "endpoint": sub.endpoint,
+            "keys": {"p256dh": sub.p256dh, "auth": sub.auth},
+        },
+        data=message_data,
+        vapid_private_key=vapid_obj,
+        vapid_claims={"sub": keys["subject"]},
+        ttl=VAPID_TTL,
+        timeout=PUSH_TIMEOUT,
+        requests_session=_http_session,
+    )
+
+
+def _response_status(exc: Exception) -> int | None:
+    return getattr(getattr(exc, "response", None), "status_code", None)
+
+
+def _is_transient(exc: Exception) -> bool:
+    if isinstance(exc, (requests.Timeout, requests.ConnectionError)):
+        return True
+    resp_status = _response_status(exc)
+    return resp_status is not None and (resp_status == 429 or resp_status >= 500)
+
+
+def _retry_delay(attempts: int) -> timedelta:
+    delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (attempts - 1))
+    return timedelta(seconds=random.uniform(delay / 2, delay))
+
+
+def _retry_after(exc: Exception) -> timedelta | None:
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    value = headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return timedelta(seconds=max(0, int(value)))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(timedelta(0), retry_at - datetime.now(timezone.utc))
+
+
+def _next_attempt_at(exc: Exception, attempts: int, now_utc: datetime) -> datetime:
+    delay = _retry_delay(attempts)
+    retry_after = _retry_after(exc)
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return now_utc + delay
+
+
+def _prune_subscriptions(db: Session, subscriptions: list[Subscription]) -> None:
+    # Only count rows this transaction actually deleted, a concurrent send may have pruned them already.
+    pruned = []
+    for sub in subscriptions:
+        result = db.execute(
+            delete(Subscription).where(Subscription.id == sub.id).execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 1:
+            pruned.append(sub.endpoint)
+    record_subscribers_pruned(db, pruned)
+
+
+def send_push_notification(
+    notification_data: Dict[str, Any], db: Session, notification_id: int | None = None
+) -> Dict[str, int]:
     subscriptions = db.execute(select(Subscription)).scalars().all()
     if not subscriptions:
         logger.info("No subscriptions found to send notification.")
-        return {"sent": 0, "failed": 0}
+        return {"sent": 0, "failed": 0, "retrying": 0}
 
     keys = get_cached_vapid_keys()
     vapid_obj = Vapid.from_pem(keys["private_key"].encode("utf-8"))
 
     sent = 0
     failed = 0
+    retrying = 0
+    pruned = []
     message_data = json.dumps(notification_data)
+    now_utc = datetime.now(timezone.utc)
 
     for sub in subscriptions:
         try:
-            webpush(
-                subscription_info={
-                    "endpoint": sub.endpoint,
-                    "keys": {"p256dh": sub.p256dh, "auth": sub.auth},
-                },
-                data=message_data,
-                vapid_private_key=vapid_obj,
-                vapid_claims={"sub": keys["subject"]},
-                ttl=VAPID_TTL,
-            )
+            _push(sub, message_data, vapid_obj, keys)
             sent += 1
-        except WebPushException as exc:
+        except (WebPushException, requests.RequestException) as exc:
             logger.error(f"WebPush Error for {sub.endpoint[:30]}...: {exc}")
             failed += 1
-            resp_status = getattr(exc.response, "status_code", None)
+            resp_status = _response_status(exc)
             if resp_status in {403, 404, 410}:
                 logger.info(f"Removing invalid subscription: {sub.endpoint[:30]}... (Status: {resp_status})")
-                db.delete(sub)
+                pruned.append(sub)
+            elif notification_id is not None and RETRY_MAX_ATTEMPTS > 1 and _is_transient(exc):
+                db.add(
+                    DeliveryRetry(
+                        notification_id=notification_id,
+                        subscription_id=sub.id,
+                        next_attempt_at=_next_attempt_at(exc, 1, now_utc),
+                        last_error=str(exc),
+                    )
+                )
+                retrying += 1
+
+    # Queued retries are committed by the caller together with the notification counts they adjust.
+    _prune_subscriptions(db, pruned)
+    logger.info(f"Notification sent: {sent} successful, {failed} failed, {retrying} queued for retry.")
+    return {"sent": sent, "failed": failed, "retrying": retrying}
+
+
+def _process_retry_batch(db: Session) -> int:
+    now_utc = datetime.now(timezone.utc)
+    retries = (
+        db.execute(
+            select(DeliveryRetry)
+            .where(DeliveryRetry.next_attempt_at <= now_utc)
+            .order_by(DeliveryRetry.next_attempt_at)
+            .limit(RETRY_BATCH_SIZE)
+        )
+        .scalars()
+        .all()
+    )
+    if not retries:
+        return 0
+
+    keys = get_cached_vapid_keys()
+    if not keys:
+        logger.warning("Retry queue: No VAPID keys configured, dropping queued retries.")
+        for retry in retries:
+            db.delete(retry)
+        db.commit()
+        return len(retries)
+
+    vapid_obj = Vapid.from_pem(keys["private_key"].encode("utf-8"))
+    notifications: Dict[int, Notification] = {}
+    messages: Dict[int, str] = {}
+    delivered: Counter = Counter()
+    pruned = []
+    pruned_ids = set()
+
+    for retry in retries:
+        if retry.notification_id not in notifications:
+            notifications[retry.notification_id] = db.get(Notification, retry.notification_id)
+        notification = notifications[retry.notification_id]
+        sub = None if retry.subscription_id in pruned_ids else db.get(Subscription, retry.subscription_id)
+        if notification is None or sub is None:
+            db.delete(retry)
+            continue
+
+        if notification.id not in messages:
+            messages[notification.id] = json.dumps(build_notification_data(notification))
 
+        try:
+            _push(sub, messages[notification.id], vapid_obj, keys)
+        except (WebPushException, requests.RequestException) as exc:
+            resp_status = _response_status(exc)
+            if resp_status in {403, 404, 410}:
+                logger.info(f"Removing invalid subscription: {sub.endpoint[:30]}... (Status: {resp_status})")
+                pruned.append(sub)
+                pruned_ids.add(sub.id)
+                db.delete(retry)
+            elif _is_transient(exc) and retry.attempts + 1 < RETRY_MAX_ATTEMPTS:
+                retry.attempts += 1
+                retry.next_attempt_at = _next_attempt_at(exc, retry.attempts, now_utc)
+                retry.last_error = str(exc)
+            else:
+                logger.error(
+                    f"Retry gave up for {sub.endpoint[:30]}... "
+                    f"(notification {notification.id}, attempt {retry.attempts + 1}): {exc}"
+                )
+                db.delete(retry)
+            continue
+
+        db.delete(retry)
+        notification.successful_count += 1
+        notification.failed_count -= 1
+        notification.status = "sent"
+        delivered[notification.id] += 1
+
+    for notification_id, count in delivered.items():
+        record_delivery(db, notifications[notification_id], count, -count)
+    _prune_subscriptions(db, pruned)
     db.commit()
-    logger.info(f"Notification sent: {sent} successful, {failed} failed.")
-    return {"sent": sent, "failed": failed}
+    return len(retries)
+
+
+def process_retry_queue():
+    db: Session = SessionLocal()
+    try:
+        processed = _process_retry_batch(db)
+        total = processed
+        while processed == RETRY_BATCH_SIZE:
+            processed = _process_retry_batch(db)
+            total += processed
+        if total:
+            logger.info(f"Retry queue: Processed {total} queued deliveries.")
+    except Exception:
+        db.rollback()
+        logger.exception("Retry queue processing failed")
+    finally:
+        db.close()
 
 
 def perform_resilience_check(db: Session, scheduler: BackgroundScheduler):
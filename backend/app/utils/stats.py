@@ -0,0 +1,210 @@
+import logging
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Iterable
+from urllib.parse import urlsplit
+
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.orm import Session
+
+from ..core.config import STATS_DAYS
+from ..core.database import SessionLocal
+from ..core.models import DailyStat, Notification, OriginStat, StatCounter, Subscription
+
+logger = logging.getLogger(__name__)
+
+SUBSCRIBERS_COUNTER = "subscribers"
+
+RECONCILE_ATTEMPTS = 3
+
+_UPSERT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def endpoint_origin(endpoint: Any) -> str:
+    parts = urlsplit(str(endpoint))
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def _as_date(value: Any) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def _today() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+def _bump(db: Session, model, key: Dict[str, Any], **deltas: int) -> None:
+    deltas = {column: delta for column, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    values = {column: getattr(model, column) + delta for column, delta in deltas.items()}
+    dialect = db.get_bind().dialect.name
+    if dialect in _UPSERT_INSERTS:
+        stmt = _UPSERT_INSERTS[dialect](model).values(**key, **deltas)
+        db.execute(stmt.on_conflict_do_update(index_elements=list(key), set_=values))
+        return
+
+    conditions = [getattr(model, column) == value for column, value in key.items()]
+    bump = update(model).where(*conditions).values(values).execution_options(synchronize_session=False)
+    if db.execute(bump).rowcount:
+        return
+    try:
+        with db.begin_nested():
+            db.execute(insert(model).values(**key, **deltas))
+    except IntegrityError:
+        db.execute(bump)
+
+
+def _bump_subscribers(db: Session, endpoints: Iterable[Any], sign: int, **daily: int) -> None:
+    origins = Counter(endpoint_origin(endpoint) for endpoint in endpoints)
+    total = sum(origins.values())
+    if not total:
+        return
+
+    _bump(db, StatCounter, {"name": SUBSCRIBERS_COUNTER}, value=sign * total)
+    for origin, count in origins.items():
+        _bump(db, OriginStat, {"origin": origin}, subscribers=sign * count)
+    _bump(db, DailyStat, {"day": _today()}, **{column: total for column in daily})
+
+
+def record_subscribers_added(db: Session, endpoints: Iterable[Any]) -> None:
+    _bump_subscribers(db, endpoints, 1, new_subscribers=1)
+
+
+def record_subscribers_pruned(db: Session, endpoints: Iterable[Any]) -> None:
+    _bump_subscribers(db, endpoints, -1, pruned_subscribers=1)
+
+
+def reset_subscriber_stats(db: Session) -> None:
+    db.execute(delete(OriginStat))
+    db.execute(
+        update(StatCounter)
+        .where(StatCounter.name == SUBSCRIBERS_COUNTER)
+        .values(value=0)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def record_delivery(db: Session, notification: Notification, sent: int, failed: int) -> None:
+    _bump(db, DailyStat, {"day": _as_date(notification.send_date)}, sent=sent, failed=failed)
+
+
+def record_view(db: Session, notification: Notification) -> None:
+    _bump(db, DailyStat, {"day": _as_date(notification.send_date)}, views=1)
+
+
+def _set(db: Session, model, key: Dict[str, Any], **values: int) -> None:
+    dialect = db.get_bind().dialect.name
+    if dialect in _UPSERT_INSERTS:
+        stmt = _UPSERT_INSERTS[dialect](model).values(**key, **values)
+        db.execute(stmt.on_conflict_do_update(index_elements=list(key), set_=values))
+        return
+
+    conditions = [getattr(model, column) == value for column, value in key.items()]
+    stmt = update(model).where(*conditions).values(values).execution_options(synchronize_session=False)
+    if not db.execute(stmt).rowcount:
+        db.execute(insert(model).values(**key, **values))
+
+
+def _lock_for_reconcile(db: Session) -> None:
+    if db.get_bind().dialect.name == "sqlite":
+        # A no-op write takes the database write lock, so no bump can commit between the counts and the writes.
+        db.execute(
+            update(StatCounter)
+            .where(StatCounter.name == SUBSCRIBERS_COUNTER)
+            .values(value=StatCounter.value)
+            .execution_options(synchronize_session=False)
+        )
+    else:
+        # Any bump committed after the snapshot makes this transaction fail instead of being overwritten.
+        db.connection(execution_options={"isolation_level": "SERIALIZABLE"})
+
+
+def reconcile_stats(db: Session) -> None:
+    _lock_for_reconcile(db)
+
+    total = db.execute(select(func.count(Subscription.id))).scalar_one()
+
+    origins: Counter = Counter()
+    for endpoint in db.execute(select(Subscription.endpoint).execution_options(yield_per=1000)).scalars():
+        origins[endpoint_origin(endpoint)] += 1
+
+    daily: Dict[date, Dict[str, int]] = {}
+
+    delivery_rows = db.execute(
+        select(
+            func.date(Notification.send_date),
+            func.sum(Notification.successful_count),
+            func.sum(Notification.failed_count),
+            func.sum(Notification.views),
+        ).group_by(func.date(Notification.send_date))
+    ).all()
+    for day, sent, failed, views in delivery_rows:
+        daily[_as_date(day)] = {"sent": sent or 0, "failed": failed or 0, "views": views or 0}
+
+    _set(db, StatCounter, {"name": SUBSCRIBERS_COUNTER}, value=total)
+
+    db.execute(delete(OriginStat).where(OriginStat.origin.not_in(list(origins))))
+    for origin, count in origins.items():
+        _set(db, OriginStat, {"origin": origin}, subscribers=count)
+
+    # New and pruned subscribers cannot be recomputed once rows are deleted, so they are kept as recorded.
+    for row in db.execute(select(DailyStat)).scalars():
+        values = daily.pop(row.day, {})
+        row.sent = values.get("sent", 0)
+        row.failed = values.get("failed", 0)
+        row.views = values.get("views", 0)
+    db.add_all(DailyStat(day=day, **values) for day, values in daily.items())
+
+    db.commit()
+    logger.info(f"Stats reconciled: {total} subscribers across {len(origins)} origins.")
+
+
+def reconcile_stats_job():
+    for attempt in range(1, RECONCILE_ATTEMPTS + 1):
+        db: Session = SessionLocal()
+        try:
+            reconcile_stats(db)
+            return
+        except OperationalError:
+            db.rollback()
+            if attempt == RECONCILE_ATTEMPTS:
+                logger.exception("Stats reconciliation failed")
+            else:
+                logger.warning(f"Stats reconciliation conflicted with a concurrent update, retrying ({attempt})")
+        except Exception:
+            db.rollback()
+            logger.exception("Stats reconciliation failed")
+            return
+        finally:
+            db.close()
+
+
+def ensure_stats(db: Session) -> None:
+    if db.get(StatCounter, SUBSCRIBERS_COUNTER) is None:
+        logger.info("Stats: No counters found, running initial reconciliation.")
+        reconcile_stats_job()
+
+
+def get_dashboard_stats(db: Session) -> Dict[str, Any]:
+    counter = db.get(StatCounter, SUBSCRIBERS_COUNTER)
+    origins = db.execute(select(OriginStat).where(OriginStat.subscribers > 0)).scalars().all()
+    daily = (
+        db.execute(
+            select(DailyStat).where(DailyStat.day > _today() - timedelta(days=STATS_DAYS)).order_by(DailyStat.day)
+        )
+        .scalars()
+        .all()
+    )
+    return {
+        "devices": counter.value if counter else 0,
+        "origins": {o.origin: o.subscribers for o in origins},
+        "daily": daily,
+    }